@@ -0,0 +1,588 @@
+"""
+Persistent trigram index for log files
+Splits a log into blocks of whole lines and stores, for every trigram, the
+blocks containing it. A regex search then only has to read the blocks that
+contain all the trigrams of the pattern's required literals.
+
+The index for application.log lives next to it in application.log.tri and is
+memory-mapped at query time. It is updated incrementally: only bytes written
+since the last update are read and tokenised, but the index file itself is
+rewritten, so queries never update it. They build a missing index once and
+otherwise scan the data written since the last update as plain text; run this
+script from cron as well as logrotate to keep that tail short.
+
+Compressed archives (.gz/.bz2/.zst) cannot be seeked: reaching a candidate
+block means decompressing everything before it, and the scan stops after the
+last candidate block. An indexed query on an archive therefore skips the
+regex work and decoding of non-candidate blocks but not their decompression;
+it is a constant factor faster than a linear scan (about 2x on a 34 MB .gz in
+benchmarks/bench.py), not proportional to the matching blocks as on plain
+files. Keep archives uncompressed (no `compress` in logrotate) where
+sub-second queries over tens of GB matter.
+
+Usage:
+    python log_index.py application.log application.log.1 application.log.2.gz ...
+
+The first file is the live log, the rest its rotated archives. Run it from
+logrotate so indexes follow the files as they are renamed and compressed:
+
+    /var/log/app/application.log {
+        daily
+        rotate 7
+        compress
+        delaycompress
+        postrotate
+            python3 /opt/tools/log_index.py /var/log/app/application.log /var/log/app/application.log.[0-9]*
+        endscript
+    }
+"""
+
+import bz2
+import glob
+import gzip
+import io
+import mmap
+import os
+import re
+import struct
+import sys
+import warnings
+import zlib
+from array import array
+from bisect import bisect_left
+from re import IGNORECASE
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+try:
+    import zstandard
+except ImportError:  # .zst archives need `pip install zstandard`
+    zstandard = None
+
+# The regex parser is internal to the re module; if it moves or changes shape,
+# required_literals() returns None and searches fall back to a full scan.
+try:
+    import re._parser as sre_parse
+    from re._constants import BRANCH, LITERAL, MAX_REPEAT, MIN_REPEAT, SUBPATTERN
+except ImportError:  # Python < 3.11
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            import sre_parse
+            from sre_constants import BRANCH, LITERAL, MAX_REPEAT, MIN_REPEAT, SUBPATTERN
+    except ImportError:
+        sre_parse = None
+        warnings.warn("re module parser not found: log searches will not use literal "
+                      "prefilters or the trigram index", RuntimeWarning)
+
+MAGIC = b"TRI1"
+INDEX_SUFFIX = ".tri"
+BLOCK_SIZE = 256 * 1024
+HEAD_BYTES = 4096
+COMPRESSED_SUFFIXES = (".gz", ".bz2", ".zst")
+
+# magic, byte order, head length, head crc32, indexed bytes, indexed lines,
+# source file size, source mtime, block size, block count, trigram count, posting count
+HEADER = struct.Struct("<4sBxxxIIQQQQIIIQ")
+# Sections follow the header, native byte order, in this order:
+#   block offsets (Q), block lengths (I), block first line numbers (Q),
+#   trigrams (I, sorted), posting offsets (Q), posting counts (I), postings (I)
+BYTE_ORDER = 0 if sys.byteorder == "little" else 1
+
+Opener = Callable[[str], BinaryIO]
+
+
+def open_binary(filepath: str) -> BinaryIO:
+    return open(filepath, "rb")
+
+
+def open_compressed(filepath: str) -> BinaryIO:
+    """
+    Like open_binary, decompressing .gz/.bz2/.zst archives on the fly
+    (never to disk). .zst needs `pip install zstandard`.
+    """
+    if filepath.endswith(".gz"):
+        return gzip.open(filepath, "rb")
+    if filepath.endswith(".bz2"):
+        return bz2.open(filepath, "rb")
+    if filepath.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is required to read {filepath}")
+        # pzstd and concatenated archives hold several frames; read them all
+        raw = zstandard.ZstdDecompressor().stream_reader(open(filepath, "rb"), closefd=True,
+                                                         read_across_frames=True)
+        return io.BufferedReader(raw)
+    return open(filepath, "rb")
+
+
+def iter_lines(f: BinaryIO, chunk_size: int = BLOCK_SIZE) -> Iterator[bytes]:
+    """Lines of a binary stream, split as text mode splits them: at \n, \r\n and \r"""
+    pending = b""
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        lines = (pending + chunk).splitlines(keepends=True)
+        # The last line may be incomplete, or a \r whose \n is in the next chunk
+        pending = lines.pop()
+        yield from lines
+    if pending:
+        yield pending
+
+
+def count_lines(data: bytes) -> int:
+    """Number of line endings in data, counted like iter_lines()"""
+    return data.count(b"\n") + data.count(b"\r") - data.count(b"\r\n")
+
+
+def index_path(filepath: str) -> str:
+    return filepath + INDEX_SUFFIX
+
+
+def trigrams(data: bytes) -> Set[int]:
+    """Distinct trigrams of a block, packed as 24-bit integers"""
+    return {(a << 16) | (b << 8) | c for a, b, c in set(zip(data, data[1:], data[2:]))}
+
+
+def _section(buf, offset: int, fmt: str, count: int) -> Tuple[memoryview, int]:
+    size = array(fmt).itemsize * count
+    return memoryview(buf)[offset:offset + size].cast(fmt), offset + size
+
+
+class TrigramIndex:
+    """Read-only, memory-mapped view of an index file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            # Raises ValueError for an empty file
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mmap) < HEADER.size:
+            self.close()
+            raise ValueError(f"{path} is truncated")
+        (magic, byte_order, self.head_len, self.head_crc, self.indexed_bytes,
+         self.indexed_lines, self.source_size, self.source_mtime_ns, self.block_size,
+         self.block_count, self.trigram_count, self.posting_count) = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or byte_order != BYTE_ORDER:
+            self.close()
+            raise ValueError(f"{path} is not a trigram index for this platform")
+        expected = (HEADER.size + self.block_count * (8 + 4 + 8)
+                    + self.trigram_count * (4 + 8 + 4) + self.posting_count * 4)
+        if len(self._mmap) != expected:
+            self.close()
+            raise ValueError(f"{path} is truncated or partly written")
+
+        offset = HEADER.size
+        self.block_offsets, offset = _section(self._mmap, offset, "Q", self.block_count)
+        self.block_lengths, offset = _section(self._mmap, offset, "I", self.block_count)
+        self.block_lines, offset = _section(self._mmap, offset, "Q", self.block_count)
+        self.trigrams, offset = _section(self._mmap, offset, "I", self.trigram_count)
+        self.posting_offsets, offset = _section(self._mmap, offset, "Q", self.trigram_count)
+        self.posting_counts, offset = _section(self._mmap, offset, "I", self.trigram_count)
+        self.postings, offset = _section(self._mmap, offset, "I", self.posting_count)
+
+    def close(self):
+        for name in ("block_offsets", "block_lengths", "block_lines", "trigrams",
+                     "posting_offsets", "posting_counts", "postings"):
+            view = self.__dict__.pop(name, None)
+            if view is not None:
+                view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def blocks_with(self, trigram: int) -> memoryview:
+        i = bisect_left(self.trigrams, trigram)
+        if i == len(self.trigrams) or self.trigrams[i] != trigram:
+            return self.postings[0:0]
+        start = self.posting_offsets[i]
+        return self.postings[start:start + self.posting_counts[i]]
+
+    def blocks_with_literal(self, literal: bytes) -> Optional[Set[int]]:
+        """Blocks containing every trigram of the literal (None: no constraint)"""
+        if len(literal) < 3:
+            return None
+        blocks = None
+        for trigram in trigrams(literal.lower()):
+            found = set(self.blocks_with(trigram))
+            blocks = found if blocks is None else blocks & found
+            if not blocks:
+                return set()
+        return blocks
+
+    def candidates(self, search_pattern: str) -> Optional[List[int]]:
+        """Sorted block ids that may contain a match (None: every block)"""
+        blocks = self._evaluate(required_literals(search_pattern))
+        return None if blocks is None else sorted(blocks)
+
+    def _evaluate(self, query) -> Optional[Set[int]]:
+        if query is None:
+            return None
+        if isinstance(query, bytes):
+            return self.blocks_with_literal(query)
+
+        op, parts = query
+        results = [self._evaluate(part) for part in parts]
+        if op == "or":
+            if any(result is None for result in results):
+                return None
+            return set().union(*results)
+
+        blocks = None
+        for result in results:
+            if result is not None:
+                blocks = result if blocks is None else blocks & result
+        return blocks
+
+
+# --- Query planning ---
+
+def required_literals(search_pattern: str):
+    """
+    Reduce a regex to the literals any match must contain.
+    Returns bytes, ("and", [...]), ("or", [...]) or None when nothing is required.
+    """
+    if sre_parse is None:
+        return None
+    try:
+        parsed = sre_parse.parse(search_pattern)
+        ignore_case = bool(parsed.state.flags & IGNORECASE)
+        return _sequence(list(parsed), ignore_case)
+    except Exception:
+        return None
+
+
+def literal_regex(search_pattern: str) -> Optional["re.Pattern"]:
+    """
+    Bytes regex that matches wherever the pattern's required literals could
+    be: one literal of each "and", any branch of each "or". It is a
+    necessary condition for a match, so lines it rejects need no decoding.
+    """
+    def alternatives(part) -> bytes:
+        if isinstance(part, bytes):
+            return re.escape(part)
+        op, parts = part
+        if op == "or":
+            return b"|".join(b"(?:" + alternatives(p) + b")" for p in parts)
+        longest = max(parts, key=lambda p: len(p) if isinstance(p, bytes) else 0)
+        return alternatives(longest)
+
+    query = required_literals(search_pattern)
+    if query is None:
+        return None
+    # Any case-insensitive part, global or (?i:...), makes the whole test fold case
+    ignore_case = bool(re.compile(search_pattern).flags & IGNORECASE) or "(?i" in search_pattern
+    return re.compile(alternatives(query), IGNORECASE if ignore_case else 0)
+
+
+# Characters that cannot be required byte-for-byte: line endings are
+# translated before matching and U+FFFD stands in for undecodable bytes
+UNSAFE_LITERALS = {"\r", "\n", "\ufffd"}
+# ASCII letters that also match non-ASCII characters under IGNORECASE
+# (i/I ~ U+0130 U+0131, k/K ~ U+212A, s/S ~ U+017F)
+UNICODE_CASE_FOLDS = set("iIkKsS")
+
+
+def _literal(value: int, ignore_case: bool) -> Optional[bytes]:
+    char = chr(value)
+    if char in UNSAFE_LITERALS:
+        return None
+    # Index and query are ASCII-lowercased; other case folds cannot be matched
+    if ignore_case and (not char.isascii() or char in UNICODE_CASE_FOLDS):
+        return None
+    return char.encode("utf-8")
+
+
+def _sequence(items, ignore_case: bool):
+    parts = []
+    run = b""
+    for op, arg in items:
+        char = _literal(arg, ignore_case) if op == LITERAL else None
+        if char is not None:
+            run += char
+            continue
+        if run:
+            parts.append(run)
+            run = b""
+        if op == SUBPATTERN:
+            group_flags = arg[1]
+            parts.append(_sequence(list(arg[3]), ignore_case or bool(group_flags & IGNORECASE)))
+        elif op in (MAX_REPEAT, MIN_REPEAT) and arg[0] >= 1:
+            parts.append(_sequence(list(arg[2]), ignore_case))
+        elif op == BRANCH:
+            branches = [_sequence(list(branch), ignore_case) for branch in arg[1]]
+            parts.append(None if any(b is None for b in branches) else ("or", branches))
+    if run:
+        parts.append(run)
+
+    parts = [part for part in parts if part is not None and (not isinstance(part, bytes) or len(part) >= 3)]
+    if not parts:
+        return None
+    return parts[0] if len(parts) == 1 else ("and", parts)
+
+
+# --- Building ---
+
+def _read_head(filepath: str, length: int, opener: Opener) -> bytes:
+    with opener(filepath) as f:
+        return f.read(length)
+
+
+def open_index(filepath: str, opener: Opener = open_binary) -> Optional[TrigramIndex]:
+    """The index of a log if it still describes the file's contents"""
+    path = index_path(filepath)
+    if not os.path.exists(path):
+        return None
+    try:
+        index = TrigramIndex(path)
+    except (OSError, ValueError):
+        return None
+    head = _read_head(filepath, index.head_len, opener)
+    if len(head) != index.head_len or zlib.crc32(head) != index.head_crc:
+        index.close()
+        return None
+    return index
+
+
+def _seek(f: BinaryIO, offset: int, position: int) -> int:
+    """
+    Move forward to offset, decompressing and discarding if the stream cannot
+    seek. On archives this is O(offset): the index stores no restart points.
+    """
+    if f.seekable():
+        return f.seek(offset)
+    while position < offset:
+        skipped = len(f.read(min(offset - position, BLOCK_SIZE)))
+        if not skipped:
+            break
+        position += skipped
+    return position
+
+
+def _blocks(f: BinaryIO, block_size: int, complete_lines_only: bool) -> Iterator[bytes]:
+    """Chunks of roughly block_size bytes, always ending on a line boundary"""
+    while True:
+        chunk = f.read(block_size)
+        if not chunk:
+            return
+        if not chunk.endswith(b"\n"):
+            chunk += f.readline()
+        if not chunk.endswith(b"\n") and complete_lines_only:
+            # Trailing line still being written; leave it for the next update
+            chunk = chunk[:chunk.rfind(b"\n") + 1]
+            if chunk:
+                yield chunk
+            return
+        yield chunk
+
+
+def update(filepath: str, opener: Opener = open_binary, block_size: int = BLOCK_SIZE) -> str:
+    """
+    Build or extend the index of a log and return the index path.
+    Only data appended since the last update is read; a log that was
+    truncated or replaced (e.g. by rotation) is re-indexed from scratch.
+    """
+    stat = os.stat(filepath)
+    compressed = filepath.endswith(COMPRESSED_SUFFIXES)
+    old = open_index(filepath, opener)
+
+    if old is not None and (old.source_size, old.source_mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+        old.close()
+        return index_path(filepath)
+    if old is not None and not compressed and stat.st_size < old.indexed_bytes:
+        old.close()
+        old = None
+
+    start = old.indexed_bytes if old else 0
+    line_no = old.indexed_lines if old else 0
+    first_block = old.block_count if old else 0
+
+    offsets, lengths, lines = array("Q"), array("I"), array("Q")
+    postings: Dict[int, array] = {}
+    with opener(filepath) as f:
+        offset = _seek(f, start, 0)
+        for chunk in _blocks(f, block_size, complete_lines_only=not compressed):
+            block_id = first_block + len(offsets)
+            offsets.append(offset)
+            lengths.append(len(chunk))
+            lines.append(line_no + 1)
+            for trigram in trigrams(chunk.lower()):
+                postings.setdefault(trigram, array("I")).append(block_id)
+            offset += len(chunk)
+            line_no += count_lines(chunk)
+
+    head = _read_head(filepath, HEAD_BYTES, opener)[:min(HEAD_BYTES, offset)]
+    header = dict(head_len=len(head), head_crc=zlib.crc32(head), indexed_bytes=offset,
+                  indexed_lines=line_no, source_size=stat.st_size,
+                  source_mtime_ns=stat.st_mtime_ns, block_size=block_size)
+    try:
+        _write(filepath, header, old, offsets, lengths, lines, postings)
+    finally:
+        if old is not None:
+            old.close()
+    return index_path(filepath)
+
+
+def _write(filepath: str, header: dict, old: Optional[TrigramIndex],
+           offsets: array, lengths: array, lines: array, postings: Dict[int, array]):
+    """Merge the old index with the new blocks and atomically replace the file"""
+    old_trigrams = old.trigrams if old else []
+    new_trigrams = sorted(postings)
+
+    keys, counts, chunks = array("I"), array("I"), []
+    i = j = 0
+    while i < len(old_trigrams) or j < len(new_trigrams):
+        old_key = old_trigrams[i] if i < len(old_trigrams) else None
+        new_key = new_trigrams[j] if j < len(new_trigrams) else None
+        if new_key is None or (old_key is not None and old_key < new_key):
+            keys.append(old_key)
+            chunks.append(old.blocks_with(old_key))
+            i += 1
+        elif old_key is None or new_key < old_key:
+            keys.append(new_key)
+            chunks.append(postings[new_key])
+            j += 1
+        else:
+            keys.append(old_key)
+            chunks.append((old.blocks_with(old_key), postings[new_key]))
+            i += 1
+            j += 1
+    for chunk in chunks:
+        counts.append(sum(len(part) for part in chunk) if isinstance(chunk, tuple) else len(chunk))
+
+    posting_offsets = array("Q")
+    total = 0
+    for count in counts:
+        posting_offsets.append(total)
+        total += count
+
+    block_count = (old.block_count if old else 0) + len(offsets)
+    path = index_path(filepath)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, BYTE_ORDER, header["head_len"], header["head_crc"],
+                            header["indexed_bytes"], header["indexed_lines"], header["source_size"],
+                            header["source_mtime_ns"], header["block_size"], block_count,
+                            len(keys), total))
+        for name, new in (("block_offsets", offsets), ("block_lengths", lengths), ("block_lines", lines)):
+            if old:
+                f.write(getattr(old, name))
+            f.write(new)
+        f.write(keys)
+        f.write(posting_offsets)
+        f.write(counts)
+        for chunk in chunks:
+            for part in (chunk if isinstance(chunk, tuple) else (chunk,)):
+                f.write(part)
+    os.replace(tmp, path)
+
+
+def _index_head(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        with TrigramIndex(path) as index:
+            return index.head_len, index.head_crc
+    except (OSError, ValueError):
+        return None
+
+
+def _head_matches(filepath: str, head: Tuple[int, int], opener: Opener) -> bool:
+    head_len, head_crc = head
+    data = _read_head(filepath, head_len, opener)
+    return len(data) == head_len and zlib.crc32(data) == head_crc
+
+
+def adopt_rotated(filepath: str, members: List[str], opener: Opener = open_binary):
+    """
+    Move indexes along with the logs they describe after a rotation, so
+    application.log.1(.gz) does not have to be indexed again from scratch.
+    Every index of the set whose log is gone or now holds other contents is
+    matched, by the crc of the log's head, to a member without a valid index.
+    The live log may be missing (renamed, not yet recreated).
+    """
+    logs = list(dict.fromkeys([filepath] + members))
+    orphans = {}
+    paths = glob.glob(glob.escape(filepath) + ".*" + INDEX_SUFFIX)
+    if os.path.exists(index_path(filepath)):
+        paths.append(index_path(filepath))
+    for path in paths:
+        log = path[:-len(INDEX_SUFFIX)]
+        head = _index_head(path)
+        if head is None:
+            continue
+        log_opener = opener if log in logs else open_binary
+        if os.path.exists(log) and _head_matches(log, head, log_opener):
+            continue
+        orphans[path] = head
+
+    needing = [log for log in logs
+               if os.path.exists(log) and (index_path(log) in orphans or not os.path.exists(index_path(log)))]
+    if not orphans or not needing:
+        return
+
+    # Renames can form chains (.1.gz.tri -> .2.gz.tri -> ...), so park every orphan first
+    parked = {}
+    for n, (path, head) in enumerate(orphans.items()):
+        tmp = f"{path}.{os.getpid()}.{n}.adopt"
+        os.replace(path, tmp)
+        parked[tmp] = head
+
+    for log in needing:
+        for tmp, head in list(parked.items()):
+            if _head_matches(log, head, opener):
+                os.replace(tmp, index_path(log))
+                del parked[tmp]
+                break
+    for tmp in parked:
+        os.remove(tmp)
+
+
+# --- Searching ---
+
+def candidate_lines(filepath: str, search_pattern: str, opener: Opener = open_binary,
+                    build: bool = False) -> Iterator[Tuple[int, bytes]]:
+    """
+    Yield (line number, line) for the lines that may match the pattern:
+    every line of the candidate blocks plus any data not yet indexed.
+    Falls back to every line when the log has no usable index.
+    :param build: Build the index first if the log has no usable one
+    """
+    index = open_index(filepath, opener)
+    if index is None and build:
+        update(filepath, opener)
+        index = open_index(filepath, opener)
+    if index is None:
+        with opener(filepath) as f:
+            yield from enumerate(iter_lines(f), start=1)
+        return
+
+    with index, opener(filepath) as f:
+        blocks = index.candidates(search_pattern)
+        if blocks is None:
+            blocks = range(index.block_count)
+        position = 0
+        for block in blocks:
+            position = _seek(f, index.block_offsets[block], position)
+            data = f.read(index.block_lengths[block])
+            position += len(data)
+            # Blocks end on \n, so no \r\n is split between two of them
+            yield from enumerate(data.splitlines(keepends=True), start=index.block_lines[block])
+
+        if filepath.endswith(COMPRESSED_SUFFIXES):
+            # Archives are indexed to the end; decompressing the rest would find nothing new
+            return
+        _seek(f, index.indexed_bytes, position)
+        yield from enumerate(iter_lines(f), start=index.indexed_lines + 1)
+
+
+if __name__ == "__main__":
+    # Shell globs such as application.log.[0-9]* also pick up index files
+    logs = [path for path in sys.argv[1:] if not path.endswith(INDEX_SUFFIX)]
+    if logs:
+        adopt_rotated(logs[0], logs[1:], opener=open_compressed)
+    for log in logs:
+        if os.path.exists(log):
+            print(f"Indexed {log} -> {update(log, opener=open_compressed)}")
@@ -1,5 +1,14 @@
+import glob
 import logging
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+# DO/log_index.py, next to this script: archive opener, line splitting,
+# literal prefilter and the trigram index
+import log_index
 
 # --- Setup logging ---
 logging.basicConfig(
@@ -8,20 +17,205 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
-def detect_and_log(filepath: str, search_pattern: str):
+# Leading timestamp written by the logging format above (and most app logs)
+TIMESTAMP = re.compile(r"^(\d{4}-\d{2}-\d{2})[ T](\d{2}:\d{2}:\d{2})")
+# application.log, application.log.1, application.log.2.gz, ...
+ROTATION_INDEX = re.compile(r"\.(\d+)(?:\.(?:gz|bz2|zst))?$")
+
+
+def is_compressed(filepath: str) -> bool:
+    return filepath.endswith(log_index.COMPRESSED_SUFFIXES)
+
+
+def parse_timestamp(line: str) -> Optional[datetime]:
+    match = TIMESTAMP.match(line)
+    if not match:
+        return None
+    return datetime.strptime(f"{match[1]} {match[2]}", "%Y-%m-%d %H:%M:%S")
+
+
+def in_range(line: str, since: Optional[datetime], until: Optional[datetime]) -> bool:
+    """False only for lines timestamped outside since/until"""
+    ts = parse_timestamp(line)
+    return not ts or not ((since and ts < since) or (until and ts > until))
+
+
+def first_timestamp(filepath: str) -> Optional[datetime]:
+    """Timestamp of the first line that has one (only the head is decompressed)"""
+    with log_index.open_compressed(filepath) as f:
+        for line in log_index.iter_lines(f):
+            ts = parse_timestamp(decode_line(line))
+            if ts:
+                return ts
+    return None
+
+
+def last_timestamp(filepath: str, tail_bytes: int = 64 * 1024) -> Optional[datetime]:
+    """Timestamp of the last line that has one, read from the tail of a plain file"""
+    with open(filepath, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - tail_bytes))
+        for line in reversed(f.read().splitlines()):
+            ts = parse_timestamp(decode_line(line))
+            if ts:
+                return ts
+    return None
+
+
+def numbered_lines(filepath: str) -> Iterator[Tuple[int, bytes]]:
+    with log_index.open_compressed(filepath) as f:
+        yield from enumerate(log_index.iter_lines(f), start=1)
+
+
+def decode_line(line: bytes) -> str:
+    """Decode a line the way text mode would present it (\r\n and \r become \n)"""
+    text = line.decode("utf-8", errors="replace")
+    if text.endswith("\r\n"):
+        return text[:-2] + "\n"
+    if text.endswith("\r"):
+        return text[:-1] + "\n"
+    return text
+
+
+def iter_matches(filepath: str, search_pattern: str,
+                 since: Optional[datetime] = None,
+                 until: Optional[datetime] = None,
+                 use_index: bool = False) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (line number, line) for every line matching the pattern.
+    Lines are split and numbered as text mode does (at \n, \r\n and \r).
+    Plain files are read in text mode; archives and indexed blocks are read
+    as bytes, and only lines passing a literal prefilter are decoded.
+    :param since/until: Drop matched lines timestamped outside this range
+    :param use_index: Only scan the blocks the file's trigram index (see
+                      log_index.py) reports as candidates; built if missing
+    """
+    regex = re.compile(search_pattern)
+    timed = since is not None or until is not None
+
+    if not use_index and not is_compressed(filepath):
+        # Plain files: C text decoding beats any per-line prefilter
+        with open(filepath, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                if regex.search(line) and (not timed or in_range(line, since, until)):
+                    yield line_no, line.strip()
+        return
+
+    if use_index:
+        # Updating rewrites the whole index, so it is left to log_index.py
+        # (logrotate/cron); lines written since then are scanned unindexed
+        lines = log_index.candidate_lines(filepath, search_pattern,
+                                          opener=log_index.open_compressed, build=True)
+    else:
+        lines = numbered_lines(filepath)
+    # Necessary condition for a match on the raw bytes (None: no usable literals)
+    prefilter = log_index.literal_regex(search_pattern)
+
+    for line_no, raw in lines:
+        if prefilter and not prefilter.search(raw):
+            continue
+        line = decode_line(raw)
+        if regex.search(line) and (not timed or in_range(line, since, until)):
+            yield line_no, line.strip()
+
+
+def scan_file(filepath: str, search_pattern: str,
+              since: Optional[datetime] = None,
+              until: Optional[datetime] = None,
+              use_index: bool = False) -> List[Tuple[int, str]]:
+    """All matches of iter_matches() as a list (used by the process pool)"""
+    return list(iter_matches(filepath, search_pattern, since, until, use_index))
+
+
+def detect_and_log(filepath: str, search_pattern: str, use_index: bool = False):
     """
     Scan a file line by line, detect a string/pattern, and log matches.
-    :param filepath: Path to the file to scan
+    :param filepath: Path to the file to scan (plain, .gz, .bz2 or .zst)
     :param search_pattern: String or regex pattern to search
+    :param use_index: Narrow the scan with the file's trigram index
     """
-    regex = re.compile(search_pattern)
+    for line_no, line in iter_matches(filepath, search_pattern, use_index=use_index):
+        message = f"Match found in line {line_no}: {line}"
+        print(message)  # Optional console output
+        logging.info(message)
+
+
+def rotation_set(filepath: str) -> List[str]:
+    """The live log and its rotated archives, oldest first"""
+    members = [filepath] if os.path.exists(filepath) else []
+    for path in glob.glob(glob.escape(filepath) + ".*"):
+        match = ROTATION_INDEX.search(path[len(filepath):])
+        if match and match.start() == 0:
+            members.append(path)
+
+    def rotation_index(path: str) -> int:
+        match = ROTATION_INDEX.search(path[len(filepath):])
+        return int(match[1]) if match else 0
+
+    return sorted(members, key=rotation_index, reverse=True)
+
+
+def archive_ranges(members: List[str]) -> List[Tuple[Optional[datetime], Optional[datetime]]]:
+    """
+    (first, last) timestamp of every member of a rotation set, oldest first.
+    A compressed archive cannot be read from the end, so its last timestamp
+    is bounded by the first timestamp of the next (newer) member instead.
+    """
+    firsts = [first_timestamp(path) for path in members]
+    ranges = []
+    for i, path in enumerate(members):
+        if not is_compressed(path):
+            last = last_timestamp(path)
+        elif i + 1 < len(members):
+            last = firsts[i + 1]
+        else:
+            last = None
+        ranges.append((firsts[i], last))
+    return ranges
+
 
-    with open(filepath, "r", encoding="utf-8") as f:
-        for line_no, line in enumerate(f, start=1):
-            if regex.search(line):
-                message = f"Match found in line {line_no}: {line.strip()}"
-                print(message)  # Optional console output
-                logging.info(message)
+def detect_and_log_rotated(filepath: str, search_pattern: str,
+                           since: Optional[datetime] = None,
+                           until: Optional[datetime] = None,
+                           workers: Optional[int] = None,
+                           use_index: bool = False):
+    """
+    Scan a log and all of its rotated archives, one process per archive.
+    Archives whose time range falls outside since/until are skipped unread.
+    :param filepath: Path to the live log, e.g. application.log
+    :param search_pattern: String or regex pattern to search
+    :param workers: Number of processes (defaults to, and capped at, the usable CPUs)
+    :param use_index: Narrow the scan of every member with its trigram index
+    """
+    members = rotation_set(filepath)
+    if use_index:
+        log_index.adopt_rotated(filepath, members, opener=log_index.open_compressed)
+    if since or until:
+        selected = []
+        for path, (first, last) in zip(members, archive_ranges(members)):
+            if (until and first and first > until) or (since and last and last < since):
+                logging.info(f"Skipping {path}: outside requested time range")
+                continue
+            selected.append(path)
+        members = selected
+
+    # Never start more workers than the CPUs this process may run on
+    available = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    workers = min(workers or available, available)
+
+    if len(members) > 1 and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(scan_file, path, search_pattern, since, until, use_index)
+                       for path in members]
+            results = [future.result() for future in futures]
+    else:
+        results = [scan_file(path, search_pattern, since, until, use_index) for path in members]
+
+    for path, matches in zip(members, results):
+        for line_no, line in matches:
+            message = f"Match found in {os.path.basename(path)} line {line_no}: {line}"
+            print(message)  # Optional console output
+            logging.info(message)
 
 
 if __name__ == "__main__":
@@ -29,3 +223,10 @@ if __name__ == "__main__":
     file_to_scan = "application.log"   # Replace with your log file
     pattern = r"ERROR"                 # Example: detect "ERROR"
     detect_and_log(file_to_scan, pattern)
+
+    # Scan application.log plus application.log.1.gz, .2.gz, ... from a given time on
+    # detect_and_log_rotated(file_to_scan, pattern, since=datetime(2025, 1, 1))
+
+    # Repeat searches over the same logs: builds application.log.tri on first use and reuses it
+    # (`python log_index.py application.log` from cron folds newly written lines in)
+    # detect_and_log(file_to_scan, r"timeout after \d+ms", use_index=True)
@@ -0,0 +1,207 @@
+# test_log_index.py
+import gzip
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import log_index
+
+LINES = [
+    f"2025-01-01 00:00:{n % 60:02d},000 - {level} - {message}\n"
+    for n, (level, message) in enumerate(
+        [("INFO", "GET /api/data 200 12ms"),
+         ("ERROR", "connection reset by peer while talking to db-12"),
+         ("INFO", "cache miss for key user:99"),
+         ("WARNING", "Kelvin K reading from sensor"),
+         ("ERROR", "Traceback (most recent call last): timeout after 5000ms"),
+         ("INFO", "worker 7 picked up job build-42"),
+         ("DEBUG", "héllo from the build agent")] * 40
+    )
+]
+
+PATTERNS = [
+    r"ERROR",
+    r"ERROR - .*$",
+    r"timeout after \d+ms",
+    r"(?i)connection RESET",
+    r"(?i)KELVIN k",
+    r"(?i)HÉLLO",
+    r"db-12|user:99",
+    r"(worker|cache) (7|miss)",
+    r"h.llo",
+    r"zzz-not-there",
+]
+
+
+def setUpModule():
+    """Import string-logger.py (not a valid module name) from a scratch directory"""
+    global string_logger, module_dir
+    module_dir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(module_dir)  # it configures a log file in the working directory on import
+    try:
+        spec = importlib.util.spec_from_file_location(
+            "string_logger", os.path.join(os.path.dirname(os.path.abspath(__file__)), "string-logger.py"))
+        string_logger = importlib.util.module_from_spec(spec)
+        sys.modules["string_logger"] = string_logger
+        spec.loader.exec_module(string_logger)
+    finally:
+        os.chdir(cwd)
+
+
+def tearDownModule():
+    shutil.rmtree(module_dir, ignore_errors=True)
+
+
+class TestIndexedSearch(unittest.TestCase):
+    """Indexed searches must return exactly what a linear scan returns"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.log = os.path.join(self.dir, "application.log")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, data: bytes, mode: str = "wb"):
+        with open(self.log, mode) as f:
+            f.write(data)
+
+    def build(self, path: str = None):
+        # Small blocks so a handful of lines spans many of them
+        log_index.update(path or self.log, opener=log_index.open_compressed, block_size=512)
+
+    def assertIndexedEqualsLinear(self, path: str = None):
+        path = path or self.log
+        for pattern in PATTERNS:
+            with self.subTest(pattern=pattern):
+                self.assertEqual(string_logger.scan_file(path, pattern),
+                                 string_logger.scan_file(path, pattern, use_index=True))
+
+    def test_fresh_index(self):
+        """Test a freshly built index"""
+        self.write("".join(LINES).encode())
+        self.build()
+        self.assertIndexedEqualsLinear()
+        self.assertEqual(len(string_logger.scan_file(self.log, "ERROR", use_index=True)), 80)
+
+    def test_appended_log(self):
+        """Test lines appended after the index was built"""
+        self.write("".join(LINES[:100]).encode())
+        self.build()
+        self.write("".join(LINES[100:]).encode(), mode="ab")
+        before = os.stat(self.log + ".tri")
+        self.assertIndexedEqualsLinear()
+        # Queries scan the unindexed tail instead of rewriting the index
+        after = os.stat(self.log + ".tri")
+        self.assertEqual((before.st_ino, before.st_mtime_ns), (after.st_ino, after.st_mtime_ns))
+
+    def test_missing_index_is_built(self):
+        """Test that the first indexed query builds the index"""
+        self.write("".join(LINES).encode())
+        self.assertEqual(len(string_logger.scan_file(self.log, "ERROR", use_index=True)), 80)
+        index = log_index.open_index(self.log)
+        self.assertIsNotNone(index)
+        index.close()
+
+    def test_partial_trailing_line(self):
+        """Test a last line that is still being written"""
+        self.write("".join(LINES[:100]).encode() + LINES[100][:25].encode())
+        self.build()
+        self.assertIndexedEqualsLinear()
+
+        self.write(LINES[100][25:].encode() + "".join(LINES[101:]).encode(), mode="ab")
+        self.assertIndexedEqualsLinear()
+
+    def test_carriage_returns(self):
+        """Test that lone \\r and CRLF lines are numbered like text mode numbers them"""
+        data = b"progress 10%\rprogress 100%\nERROR one\r\n" + "".join(LINES).replace("\n", "\r\n").encode()
+        self.write(data)
+        with gzip.open(self.log + ".1.gz", "wb") as f:
+            f.write(data)
+        with open(self.log, "r", encoding="utf-8") as f:
+            text_mode = [line.strip() for line in f]
+
+        for path in (self.log, self.log + ".1.gz"):
+            self.build(path)
+            self.assertIndexedEqualsLinear(path)
+            for use_index in (False, True):
+                with self.subTest(path=os.path.basename(path), use_index=use_index):
+                    self.assertEqual(string_logger.scan_file(path, "ERROR one$", use_index=use_index),
+                                     [(3, "ERROR one")])
+                    self.assertEqual(string_logger.scan_file(path, "^progress 100", use_index=use_index),
+                                     [(2, "progress 100%")])
+                    self.assertEqual(string_logger.scan_file(path, "ERROR", use_index=use_index),
+                                     [(n, line) for n, line in enumerate(text_mode, start=1) if "ERROR" in line])
+
+    def test_rotated_gz(self):
+        """Test an index handed over to the gzip archive the live log was rotated into"""
+        self.write("".join(LINES).encode())
+        self.build()
+        with open(self.log, "rb") as src, gzip.open(self.log + ".1.gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(self.log)
+
+        # Live log renamed away but not recreated yet
+        members = string_logger.rotation_set(self.log)
+        log_index.adopt_rotated(self.log, members, opener=log_index.open_compressed)
+        self.assertTrue(os.path.exists(self.log + ".1.gz.tri"))
+        self.assertFalse(os.path.exists(self.log + ".tri"))
+        self.assertIndexedEqualsLinear(self.log + ".1.gz")
+
+        self.write("".join(LINES[:50]).encode())
+        self.assertIndexedEqualsLinear()
+        self.assertIndexedEqualsLinear(self.log + ".1.gz")
+
+    def test_rotation_renumbering(self):
+        """Test indexes following archives renamed from .1.gz to .2.gz"""
+        self.write("".join(LINES).encode())
+        with gzip.open(self.log + ".1.gz", "wb") as f:
+            f.write("".join(reversed(LINES)).encode())
+        self.build(self.log + ".1.gz")
+        os.rename(self.log + ".1.gz", self.log + ".2.gz")
+        shutil.copyfile(self.log, self.log + ".1")
+        self.write(b"")
+
+        members = string_logger.rotation_set(self.log)
+        log_index.adopt_rotated(self.log, members, opener=log_index.open_compressed)
+        self.assertTrue(os.path.exists(self.log + ".2.gz.tri"))
+        self.assertFalse(os.path.exists(self.log + ".1.gz.tri"))
+        self.assertIndexedEqualsLinear(self.log + ".2.gz")
+
+    def test_truncated_index_is_rebuilt(self):
+        """Test that a damaged index file falls back to a rebuild"""
+        self.write("".join(LINES).encode())
+        self.build()
+        for size in (0, 11, os.path.getsize(self.log + ".tri") - 4):
+            with self.subTest(size=size):
+                with open(self.log + ".tri", "r+b") as f:
+                    f.truncate(size)
+                self.assertIsNone(log_index.open_index(self.log))
+                self.assertIndexedEqualsLinear()
+
+
+class TestRequiredLiterals(unittest.TestCase):
+    """Test cases for reducing a regex to its required literals"""
+
+    def test_literal_runs(self):
+        self.assertEqual(log_index.required_literals(r"timeout after \d+ms"), b"timeout after ")
+
+    def test_alternation(self):
+        self.assertEqual(log_index.required_literals(r"db-12|user:99"), ("or", [b"db-12", b"user:99"]))
+        self.assertIsNone(log_index.required_literals(r"ERROR|ab"))
+
+    def test_ignore_case_drops_unicode_folds(self):
+        """Test that i/k/s, which match non-ASCII letters under IGNORECASE, are not required"""
+        self.assertEqual(log_index.required_literals(r"(?i)kelvin"), b"elv")
+
+    def test_invalid_pattern(self):
+        self.assertIsNone(log_index.required_literals(r"a(b"))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -4,9 +4,14 @@ Python-based Jenkins Pipeline Generator
 Generates Groovy pipeline code from Python configuration
 """
 
+from collections import Counter
 from dataclasses import dataclass
-from typing import List, Dict, Optional
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+import hashlib
 import json
+import re
+import textwrap
 
 @dataclass
 class Stage:
@@ -24,8 +29,17 @@ class PipelineConfig:
     post_actions: Dict[str, List[str]] = None
 
 class JenkinsPipelineBuilder:
-    def __init__(self, config: PipelineConfig):
+    def __init__(self, config: PipelineConfig,
+                 shared_steps: Optional[Dict[Tuple[str, ...], str]] = None,
+                 library: Optional[str] = None):
         self.config = config
+        # Step lists hoisted into shared-library vars, rendered as one-line calls
+        self.shared_steps = shared_steps or {}
+        self.library = library
+    
+    def resolve_steps(self, steps: List[str]) -> List[str]:
+        name = self.shared_steps.get(tuple(steps))
+        return [f"{name}()"] if name else steps
     
     def generate_parameters(self) -> str:
         if not self.config.parameters:
@@ -60,7 +74,7 @@ class JenkinsPipelineBuilder:
     }}"""
     
     def generate_stage(self, stage: Stage) -> str:
-        steps_code = "\n".join([f"                {step}" for step in stage.steps])
+        steps_code = "\n".join([f"                {step}" for step in self.resolve_steps(stage.steps)])
         
         when_clause = ""
         if stage.when:
@@ -93,7 +107,7 @@ class JenkinsPipelineBuilder:
         
         post_blocks = []
         for condition, actions in self.config.post_actions.items():
-            action_code = "\n".join([f"            {action}" for action in actions])
+            action_code = "\n".join([f"            {action}" for action in self.resolve_steps(actions)])
             post_blocks.append(f"""        {condition} {{
 {action_code}
         }}""")
@@ -104,6 +118,7 @@ class JenkinsPipelineBuilder:
     
     def build(self) -> str:
         pipeline_parts = [
+            f"@Library('{self.library}') _" if self.library else "",
             f"pipeline {{",
             f"    agent {self.config.agent}",
             self.generate_parameters(),
@@ -117,6 +132,139 @@ class JenkinsPipelineBuilder:
         pipeline_parts = [part for part in pipeline_parts if part.strip()]
         return "\n\n".join(pipeline_parts)
 
+@dataclass
+class SharedLibraryReport:
+    pipeline: int
+    inline_bytes: int
+    shared_bytes: int
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.inline_bytes - self.shared_bytes
+
+# script { ... } on one line or many; declarative-only, a vars step body is already scripted
+SCRIPT_BLOCK = re.compile(r"^script\s*\{(.*)\}$", re.DOTALL)
+# Directives that only exist inside a declarative pipeline and fail in a vars step
+DECLARATIVE_ONLY = re.compile(
+    r"^\s*(?:script|steps|stages|post|when|environment|options|agent|tools|triggers|matrix)\s*\{",
+    re.MULTILINE)
+
+class SharedLibraryExtractor:
+    """
+    Hoist step lists repeated across a batch of pipelines into shared-library
+    steps (vars/<name>.groovy) so each Jenkinsfile carries a one-line call.
+    The library is the implicit one set up by jenkins-set-shared-lib-programatically.groovy,
+    so the generated Jenkinsfiles need no @Library line unless `library` is given.
+    """
+    
+    def __init__(self, configs: List[PipelineConfig], min_pipelines: int = 2,
+                 library: Optional[str] = None):
+        self.configs = configs
+        self.min_pipelines = min_pipelines
+        self.library = library
+        self.shared_steps = self.find_shared_steps()
+    
+    @staticmethod
+    def step_lists(config: PipelineConfig):
+        """(var name, steps) for every stage and post condition of a pipeline"""
+        for stage in config.stages or []:
+            yield f"{stage.name}Stage", stage.steps
+        for condition, actions in (config.post_actions or {}).items():
+            yield f"post {condition}", actions
+    
+    @staticmethod
+    def var_name(label: str, steps: Tuple[str, ...]) -> str:
+        """
+        camelCase label plus a hash of the steps, so batches sharing the one
+        implicit library never write different steps under the same name
+        """
+        words = re.findall(r"[A-Za-z0-9]+", label)
+        name = "".join(word[:1].upper() + word[1:] for word in words)
+        name = name[:1].lower() + name[1:]
+        if not name[:1].isalpha():
+            name = f"step{name}"
+        digest = hashlib.sha1("\n".join(steps).encode()).hexdigest()[:6]
+        return f"{name}_{digest}"
+    
+    def find_shared_steps(self) -> Dict[Tuple[str, ...], str]:
+        counts = Counter()
+        labels = {}
+        for config in self.configs:
+            seen = set()
+            for label, steps in self.step_lists(config):
+                key = tuple(steps)
+                if key and key not in seen:
+                    seen.add(key)
+                    counts[key] += 1
+                    labels.setdefault(key, label)
+        
+        shared = {}
+        for key, count in counts.most_common():
+            if count < self.min_pipelines:
+                break
+            name = self.var_name(labels[key], key)
+            # Only hoist when the call is shorter than the inline Groovy
+            if len(f"{name}()") >= len("\n".join(key)):
+                continue
+            # ... and when the steps still run outside the declarative pipeline
+            if DECLARATIVE_ONLY.search("\n".join(self.library_body(key))):
+                continue
+            shared[key] = name
+        return shared
+    
+    @staticmethod
+    def library_body(steps: Tuple[str, ...]) -> List[str]:
+        lines = []
+        for step in steps:
+            first, _, rest = step.partition("\n")
+            text = "\n".join([first.strip()] + textwrap.dedent(rest).splitlines())
+            match = SCRIPT_BLOCK.match(text.strip())
+            if match:
+                text = textwrap.dedent(match[1].strip("\n")).strip()
+            lines.extend(text.splitlines())
+        return lines
+    
+    def library_files(self) -> Dict[str, str]:
+        """vars/<name>.groovy path -> source for every hoisted step list"""
+        files = {}
+        for steps, name in self.shared_steps.items():
+            body = "\n".join(f"    {line}" if line else "" for line in self.library_body(steps))
+            files[f"vars/{name}.groovy"] = f"""// Generated by pipeline-03-pythonwrapper.py
+def call() {{
+{body}
+}}
+"""
+        return files
+    
+    def pipelines(self) -> List[str]:
+        return [JenkinsPipelineBuilder(config, self.shared_steps, self.library).build()
+                for config in self.configs]
+    
+    def report(self) -> List[SharedLibraryReport]:
+        return [
+            SharedLibraryReport(
+                pipeline=n,
+                inline_bytes=len(JenkinsPipelineBuilder(config).build().encode()),
+                shared_bytes=len(shared.encode())
+            )
+            for n, (config, shared) in enumerate(zip(self.configs, self.pipelines()))
+        ]
+    
+    def write(self, output_dir: str) -> List[SharedLibraryReport]:
+        """Write vars/*.groovy and Jenkinsfile-<n> for each pipeline under output_dir"""
+        root = Path(output_dir)
+        library_files = self.library_files()
+        for path, source in library_files.items():
+            target = root / path
+            if target.exists() and target.read_text() != source:
+                raise FileExistsError(f"{target} already exists with different steps")
+        for path, source in library_files.items():
+            (root / path).parent.mkdir(parents=True, exist_ok=True)
+            (root / path).write_text(source)
+        for n, pipeline_code in enumerate(self.pipelines()):
+            (root / f"Jenkinsfile-{n}").write_text(pipeline_code)
+        return self.report()
+
 # Example usage
 def create_flask_pipeline():
     config = PipelineConfig(
@@ -184,6 +332,13 @@ def create_flask_pipeline():
     builder = JenkinsPipelineBuilder(config)
     return builder.build()
 
+def extract_shared_library(configs: List[PipelineConfig], output_dir: str = "generated"):
+    extractor = SharedLibraryExtractor(configs)
+    for entry in extractor.write(output_dir):
+        print(f"Jenkinsfile-{entry.pipeline}: {entry.inline_bytes} -> {entry.shared_bytes} bytes "
+              f"({entry.bytes_saved} saved)")
+    print(f"Shared steps: {', '.join(sorted(extractor.shared_steps.values()))}")
+
 if __name__ == "__main__":
     pipeline_code = create_flask_pipeline()
     print(pipeline_code)
@@ -0,0 +1,145 @@
+# test_pipeline_wrapper.py
+import hashlib
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+
+# pipeline-03-pythonwrapper.py is not a valid module name, so load it by path
+spec = importlib.util.spec_from_file_location(
+    "pipeline_wrapper", os.path.join(os.path.dirname(os.path.abspath(__file__)), "pipeline-03-pythonwrapper.py"))
+pipeline_wrapper = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(pipeline_wrapper)
+
+PipelineConfig = pipeline_wrapper.PipelineConfig
+Stage = pipeline_wrapper.Stage
+JenkinsPipelineBuilder = pipeline_wrapper.JenkinsPipelineBuilder
+SharedLibraryExtractor = pipeline_wrapper.SharedLibraryExtractor
+
+BUILD_STEP = "script { sh 'make all && make install' }"
+TEST_STEPS = [
+    '''script {
+                    def report = "reports/${env.BUILD_NUMBER}.xml"
+                    sh "python -m pytest --junitxml=${report}"
+                }''',
+    "junit 'reports/*.xml'",
+]
+
+
+def config(build_steps=None, test_steps=None, post_actions=None):
+    return PipelineConfig(
+        stages=[
+            Stage(name="Build", steps=build_steps or [BUILD_STEP]),
+            Stage(name="Test", steps=test_steps or TEST_STEPS),
+        ],
+        post_actions=post_actions,
+    )
+
+
+class TestSharedLibraryExtractor(unittest.TestCase):
+    """Test cases for hoisting repeated steps into shared-library vars"""
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_hoists_repeated_steps(self):
+        """Test that step lists used by several pipelines become vars calls"""
+        extractor = SharedLibraryExtractor([config(), config()])
+        self.assertEqual(set(extractor.shared_steps), {(BUILD_STEP,), tuple(TEST_STEPS)})
+        for pipeline in extractor.pipelines():
+            self.assertNotIn("make install", pipeline)
+            self.assertIn(f"{extractor.shared_steps[(BUILD_STEP,)]}()", pipeline)
+
+    def test_min_pipelines(self):
+        """Test that steps used by fewer than min_pipelines pipelines stay inline"""
+        extractor = SharedLibraryExtractor([config(), config(build_steps=["sh 'make dist && make publish'"])])
+        self.assertNotIn(("sh 'make dist && make publish'",), extractor.shared_steps)
+        self.assertNotIn((BUILD_STEP,), extractor.shared_steps)
+        self.assertIn(tuple(TEST_STEPS), extractor.shared_steps)
+
+    def test_hoists_only_when_call_is_shorter(self):
+        """Test that steps shorter than their vars call are not hoisted"""
+        short = {"failure": ['echo "Build failed!"']}
+        extractor = SharedLibraryExtractor([config(post_actions=short), config(post_actions=short)])
+        self.assertNotIn(('echo "Build failed!"',), extractor.shared_steps)
+        self.assertIn('echo "Build failed!"', extractor.pipelines()[0])
+
+    def test_var_name_has_steps_hash(self):
+        """Test that var names are camelCase plus the first 6 hex digits of the steps' sha1"""
+        digest = hashlib.sha1(BUILD_STEP.encode()).hexdigest()[:6]
+        self.assertEqual(SharedLibraryExtractor.var_name("Build Stage", (BUILD_STEP,)), f"buildStage_{digest}")
+        self.assertNotEqual(SharedLibraryExtractor.var_name("BuildStage", (BUILD_STEP,)),
+                            SharedLibraryExtractor.var_name("BuildStage", ("sh 'make'",)))
+        self.assertTrue(SharedLibraryExtractor.var_name("1st", ("x",)).startswith("step1st_"))
+
+    def test_unwraps_one_line_script(self):
+        """Test that a one-line script { } block is unwrapped in the vars step"""
+        extractor = SharedLibraryExtractor([config(), config()])
+        name = extractor.shared_steps[(BUILD_STEP,)]
+        source = extractor.library_files()[f"vars/{name}.groovy"]
+        self.assertNotIn("script", source)
+        self.assertIn("def call() {\n    sh 'make all && make install'\n}", source)
+
+    def test_unwraps_multi_line_script(self):
+        """Test that a multi-line script { } block is unwrapped and dedented"""
+        self.assertEqual(SharedLibraryExtractor.library_body(tuple(TEST_STEPS)), [
+            'def report = "reports/${env.BUILD_NUMBER}.xml"',
+            'sh "python -m pytest --junitxml=${report}"',
+            "junit 'reports/*.xml'",
+        ])
+
+    def test_never_hoists_declarative_directives(self):
+        """Test that steps still containing a declarative-only directive stay inline"""
+        nested = ['''dir('app') {
+                    script {
+                        sh 'make all && make install'
+                    }
+                }''']
+        extractor = SharedLibraryExtractor([config(build_steps=nested), config(build_steps=nested)])
+        self.assertNotIn(tuple(nested), extractor.shared_steps)
+        for source in extractor.library_files().values():
+            self.assertNotIn("script", source)
+
+    def test_report_byte_counts(self):
+        """Test that the report compares the inline and shared-library Jenkinsfiles"""
+        configs = [config(), config()]
+        extractor = SharedLibraryExtractor(configs)
+        report = extractor.report()
+        self.assertEqual(len(report), 2)
+        for entry, cfg, pipeline in zip(report, configs, extractor.pipelines()):
+            self.assertEqual(entry.inline_bytes, len(JenkinsPipelineBuilder(cfg).build().encode()))
+            self.assertEqual(entry.shared_bytes, len(pipeline.encode()))
+            self.assertEqual(entry.bytes_saved, entry.inline_bytes - entry.shared_bytes)
+            self.assertGreater(entry.bytes_saved, 0)
+
+    def test_write(self):
+        """Test that write() creates the vars and one Jenkinsfile per pipeline"""
+        extractor = SharedLibraryExtractor([config(), config()])
+        extractor.write(self.output_dir)
+        for path, source in extractor.library_files().items():
+            with open(os.path.join(self.output_dir, path)) as f:
+                self.assertEqual(f.read(), source)
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, "Jenkinsfile-1")))
+        # Writing the same steps again is fine
+        extractor.write(self.output_dir)
+
+    def test_write_refuses_different_existing_var(self):
+        """Test that write() raises FileExistsError rather than overwrite other steps"""
+        extractor = SharedLibraryExtractor([config(), config()])
+        name = extractor.shared_steps[(BUILD_STEP,)]
+        os.makedirs(os.path.join(self.output_dir, "vars"))
+        with open(os.path.join(self.output_dir, "vars", f"{name}.groovy"), "w") as f:
+            f.write("def call() {\n    sh 'something else'\n}\n")
+        with self.assertRaises(FileExistsError):
+            extractor.write(self.output_dir)
+        # Nothing is written when any target conflicts
+        self.assertEqual(os.listdir(self.output_dir), ["vars"])
+        self.assertEqual(os.listdir(os.path.join(self.output_dir, "vars")), [f"{name}.groovy"])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the Python code in this repository
+Times the pipeline generator, the log scanner, the data helpers, the config
+loaders and the Flask routes against synthetic data, stores the results as
+JSON and compares them with a baseline so a Cloud Build step can fail on
+regressions.
+
+Usage:
+    python benchmarks/bench.py list
+    python benchmarks/bench.py run --output results.json
+    python benchmarks/bench.py compare baseline.json results.json --threshold 0.15
+"""
+
+import argparse
+import contextlib
+import gc
+import importlib.util
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import datagen  # noqa: E402
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Full-size inputs; scaled down with --scale for quick local runs
+LOG_LINES = 500_000
+ROTATED_ARCHIVES = 7
+RARE_PATTERN = r"OutOfMemoryError: .* in build-\d+"
+RECORDS = 1_000_000
+PIPELINES = 2_000
+CONFIG_LOADS = 1_000
+REQUESTS = 1_000
+
+
+class Skip(Exception):
+    """Raised by a benchmark setup when its dependencies are unavailable"""
+
+
+@dataclass
+class Case:
+    fn: Callable[[], Any]
+    bytes_processed: Optional[int] = None
+    metrics: Dict[str, Any] = field(default_factory=dict)
+    # Spawns worker processes; never pinned, since workers inherit the affinity
+    parallel: bool = False
+
+
+class Workspace:
+    """Scratch directory and scale factor shared by all benchmark setups"""
+
+    def __init__(self, path: Path, scale: float):
+        self.path = path
+        self.scale = scale
+        self._modules: Dict[str, Any] = {}
+
+    def size(self, full: int) -> int:
+        return max(1, int(full * self.scale))
+
+    def load(self, relpath: str):
+        """Import a repo file by path (most of them are not valid module names)"""
+        if relpath in self._modules:
+            return self._modules[relpath]
+
+        # Like running the file as a script: its directory is importable
+        directory = str((REPO_ROOT / relpath).parent)
+        if directory not in sys.path:
+            sys.path.append(directory)
+
+        name = "bench_" + Path(relpath).stem.replace("-", "_").replace(".", "_")
+        spec = importlib.util.spec_from_file_location(name, REPO_ROOT / relpath)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        try:
+            spec.loader.exec_module(module)
+        except ImportError as e:
+            del sys.modules[name]
+            raise Skip(f"{relpath}: {e}")
+
+        self._modules[relpath] = module
+        return module
+
+
+BENCHMARKS: Dict[str, Callable[[Workspace], Case]] = {}
+
+
+def benchmark(name: str):
+    """Register a setup function that returns the Case to time"""
+    def register(setup: Callable[[Workspace], Case]):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def quiet(fn: Callable[[], Any]) -> Callable[[], Any]:
+    """Swallow stdout so console printing does not dominate the timing"""
+    def run():
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            return fn()
+    return run
+
+
+# --- Benchmarks ---
+
+@benchmark("pipeline_builder.build")
+def bench_pipeline_build(ws: Workspace) -> Case:
+    module = ws.load("Jenkins/pipelines/pipeline-03-pythonwrapper.py")
+    configs = datagen.pipeline_configs(ws.size(PIPELINES), module)
+    return Case(lambda: [module.JenkinsPipelineBuilder(c).build() for c in configs])
+
+
+@benchmark("pipeline_builder.shared_library")
+def bench_shared_library(ws: Workspace) -> Case:
+    module = ws.load("Jenkins/pipelines/pipeline-03-pythonwrapper.py")
+    configs = datagen.pipeline_configs(ws.size(PIPELINES), module)
+    report = module.SharedLibraryExtractor(configs).report()
+    inline = sum(entry.inline_bytes for entry in report)
+    saved = sum(entry.bytes_saved for entry in report)
+    return Case(lambda: module.SharedLibraryExtractor(configs).pipelines(),
+                metrics={"inline_bytes": inline, "bytes_saved": saved,
+                         "bytes_saved_per_pipeline": saved / len(report)})
+
+
+@benchmark("string_logger.detect_and_log")
+def bench_detect_and_log(ws: Workspace) -> Case:
+    module = ws.load("DO/string-logger.py")
+    log = datagen.write_log(ws.path / "application.log", ws.size(LOG_LINES))
+    return Case(quiet(lambda: module.detect_and_log(str(log), r"ERROR")),
+                bytes_processed=log.stat().st_size)
+
+
+@benchmark("string_logger.detect_and_log_rotated")
+def bench_detect_and_log_rotated(ws: Workspace) -> Case:
+    module = ws.load("DO/string-logger.py")
+    log = datagen.write_rotation_set(ws.path / "rotated.log", ROTATED_ARCHIVES + 1,
+                                     ws.size(LOG_LINES) // 4)
+    return Case(quiet(lambda: module.detect_and_log_rotated(str(log), r"ERROR")),
+                bytes_processed=sum(os.path.getsize(p) for p in module.rotation_set(str(log))),
+                parallel=True)
+
+
+@benchmark("string_logger.detect_and_log_rotated.since")
+def bench_detect_and_log_rotated_since(ws: Workspace) -> Case:
+    module = ws.load("DO/string-logger.py")
+    log = ws.path / "rotated.log"
+    if not log.exists():
+        datagen.write_rotation_set(log, ROTATED_ARCHIVES + 1, ws.size(LOG_LINES) // 4)
+    since = module.first_timestamp(module.rotation_set(str(log))[-2])
+    return Case(quiet(lambda: module.detect_and_log_rotated(str(log), r"ERROR", since=since)),
+                parallel=True)
+
+
+def indexed_log(ws: Workspace) -> Path:
+    log = ws.path / "indexed.log"
+    if not log.exists():
+        datagen.write_log(log, ws.size(LOG_LINES), seed=datagen.SEED + 1)
+    return log
+
+
+@benchmark("log_index.update")
+def bench_index_build(ws: Workspace) -> Case:
+    module = ws.load("DO/log_index.py")
+    log = str(indexed_log(ws))
+    index = module.index_path(log)
+
+    def run():
+        if os.path.exists(index):
+            os.remove(index)
+        module.update(log)
+
+    run()
+    log_size, index_size = os.path.getsize(log), os.path.getsize(index)
+    return Case(run, bytes_processed=log_size,
+                metrics={"index_bytes": index_size, "index_ratio": index_size / log_size})
+
+
+@benchmark("string_logger.detect_and_log.rare")
+def bench_detect_and_log_rare(ws: Workspace) -> Case:
+    module = ws.load("DO/string-logger.py")
+    log = str(indexed_log(ws))
+    return Case(quiet(lambda: module.detect_and_log(log, RARE_PATTERN)))
+
+
+@benchmark("string_logger.detect_and_log.rare.indexed")
+def bench_detect_and_log_rare_indexed(ws: Workspace) -> Case:
+    module = ws.load("DO/string-logger.py")
+    log = str(indexed_log(ws))
+    module.log_index.update(log)
+    return Case(quiet(lambda: module.detect_and_log(log, RARE_PATTERN, use_index=True)))
+
+
+def indexed_archive(ws: Workspace) -> Path:
+    archive = ws.path / "indexed.log.1.gz"
+    if not archive.exists():
+        datagen.write_gzip_log(archive, ws.size(LOG_LINES), seed=datagen.SEED + 1)
+    return archive
+
+
+@benchmark("string_logger.detect_and_log.rare.gz")
+def bench_detect_and_log_rare_gz(ws: Workspace) -> Case:
+    module = ws.load("DO/string-logger.py")
+    archive = str(indexed_archive(ws))
+    return Case(quiet(lambda: module.detect_and_log(archive, RARE_PATTERN)))
+
+
+@benchmark("string_logger.detect_and_log.rare.indexed.gz")
+def bench_detect_and_log_rare_indexed_gz(ws: Workspace) -> Case:
+    # Archives cannot be seeked, so this still decompresses up to the last candidate block
+    module = ws.load("DO/string-logger.py")
+    archive = str(indexed_archive(ws))
+    module.log_index.update(archive, opener=module.log_index.open_compressed)
+    return Case(quiet(lambda: module.detect_and_log(archive, RARE_PATTERN, use_index=True)))
+
+
+@benchmark("app.DataProcessor.filter_by_city")
+def bench_filter_by_city(ws: Workspace) -> Case:
+    module = ws.load("-unit-testing/app.py")
+    data = datagen.records(ws.size(RECORDS))
+    processor = module.DataProcessor()
+    return Case(lambda: processor.filter_by_city(data, "London"))
+
+
+@benchmark("app.DataProcessor.calculate_average_age")
+def bench_average_age(ws: Workspace) -> Case:
+    module = ws.load("-unit-testing/app.py")
+    data = datagen.records(ws.size(RECORDS))
+    processor = module.DataProcessor()
+    return Case(lambda: processor.calculate_average_age(data))
+
+
+@benchmark("app.read_json_file")
+def bench_read_json_file(ws: Workspace) -> Case:
+    module = ws.load("-unit-testing/app.py")
+    path = datagen.write_json(ws.path / "records.json", ws.size(RECORDS))
+    return Case(lambda: module.read_json_file(str(path)), bytes_processed=path.stat().st_size)
+
+
+@benchmark("py_config.load_pipeline_config")
+def bench_load_pipeline_config(ws: Workspace) -> Case:
+    module = ws.load("py-config/config_ini.py")
+    datagen.write_ini(ws.path / "pipeline_config.ini")
+    loads = ws.size(CONFIG_LOADS)
+    return Case(lambda: [module.load_pipeline_config() for _ in range(loads)])
+
+
+@benchmark("py_config.JenkinsPipelineConfig.get_config_file")
+def bench_get_config_file(ws: Workspace) -> Case:
+    module = ws.load("py-config/class_based_config.py")
+    config = module.JenkinsPipelineConfig(str(ws.path))
+    names = [f"pipeline-{n}" for n in range(ws.size(PIPELINES))]
+    return Case(lambda: [config.get_config_file(name) for name in names])
+
+
+@benchmark("py_config.PipelineConfig")
+def bench_env_pipeline_config(ws: Workspace) -> Case:
+    module = ws.load("py-config/en_config_base.py")
+    loads = ws.size(CONFIG_LOADS)
+    return Case(lambda: [module.PipelineConfig() for _ in range(loads)])
+
+
+@benchmark("flask.routes")
+def bench_flask_routes(ws: Workspace) -> Case:
+    module = ws.load("python-app/app.py")
+    client = module.app.test_client()
+    count = ws.size(REQUESTS)
+
+    def run():
+        for _ in range(count):
+            for route in ("/", "/health", "/api/data"):
+                client.get(route)
+    return Case(run)
+
+
+# --- Timing ---
+
+def set_affinity(cpus: Optional[set]) -> bool:
+    """Restrict the process to `cpus` where the platform supports it"""
+    if cpus is None or not hasattr(os, "sched_setaffinity"):
+        return False
+    os.sched_setaffinity(0, cpus)
+    return True
+
+
+def measure(case: Case, warmup: int, repeats: int) -> Dict[str, Any]:
+    for _ in range(warmup):
+        case.fn()
+
+    timings: List[float] = []
+    for _ in range(repeats):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter_ns()
+            case.fn()
+            timings.append((time.perf_counter_ns() - start) / 1e9)
+        finally:
+            gc.enable()
+
+    result = {
+        "median_s": statistics.median(timings),
+        "min_s": min(timings),
+        "mean_s": statistics.fmean(timings),
+        "stdev_s": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "repeats": repeats,
+    }
+    if case.bytes_processed:
+        result["throughput_mb_s"] = case.bytes_processed / result["median_s"] / 1e6
+    if case.metrics:
+        result["metrics"] = case.metrics
+    return result
+
+
+def run_benchmarks(names: List[str], scale: float, warmup: int, repeats: int,
+                   cpu: Optional[int]) -> Dict[str, Any]:
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "pinned_cpu": cpu if hasattr(os, "sched_setaffinity") else None,
+            "scale": scale,
+            "warmup": warmup,
+            "repeats": repeats,
+        },
+        "benchmarks": {},
+        "skipped": {},
+    }
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        # Several modules write files relative to the working directory on import
+        os.chdir(tmp)
+        all_cpus = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else None
+        try:
+            ws = Workspace(Path(tmp), scale)
+            for name in names:
+                try:
+                    case = BENCHMARKS[name](ws)
+                except Skip as e:
+                    results["skipped"][name] = str(e)
+                    print(f"{name:<50} skipped ({e})")
+                    continue
+                # Single-threaded cases run pinned; parallel ones get every CPU
+                pinned = cpu is not None and not case.parallel and set_affinity({cpu})
+                try:
+                    result = measure(case, warmup, repeats)
+                finally:
+                    if pinned:
+                        set_affinity(all_cpus)
+                result["pinned"] = bool(pinned)
+                results["benchmarks"][name] = result
+                print(f"{name:<50} {result['median_s'] * 1000:10.2f} ms "
+                      f"(min {result['min_s'] * 1000:.2f}, stdev {result['stdev_s'] * 1000:.2f})")
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float,
+            allow_missing: bool = False, out: io.TextIOBase = sys.stdout) -> List[str]:
+    """
+    Return the benchmarks that fail the gate: medians that regressed by more
+    than `threshold`, and baselined benchmarks that are missing or skipped
+    in the current results (unless `allow_missing`)
+    """
+    failures = []
+    if baseline["meta"].get("scale") != current["meta"].get("scale"):
+        print(f"Warning: baseline scale {baseline['meta'].get('scale')} differs from "
+              f"current scale {current['meta'].get('scale')}", file=out)
+
+    for name, base in sorted(baseline["benchmarks"].items()):
+        cur = current["benchmarks"].get(name)
+        if cur is None:
+            # A broken dependency install skips benchmarks; that must not pass silently
+            reason = current.get("skipped", {}).get(name)
+            status = f"skipped ({reason})" if reason is not None else "missing from current results"
+            if not allow_missing:
+                status += " FAILED"
+                failures.append(name)
+            print(f"{name:<50} {status}", file=out)
+            continue
+        ratio = cur["median_s"] / base["median_s"]
+        status = "ok"
+        if ratio > 1 + threshold:
+            status = "REGRESSION"
+            failures.append(name)
+        print(f"{name:<50} {base['median_s'] * 1000:10.2f} -> {cur['median_s'] * 1000:10.2f} ms "
+              f"({ratio - 1:+.1%}) {status}", file=out)
+
+    for name in sorted(set(current["benchmarks"]) - set(baseline["benchmarks"])):
+        print(f"{name:<50} new, no baseline", file=out)
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Repository benchmark suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="List registered benchmarks")
+
+    run = commands.add_parser("run", help="Run benchmarks and write JSON results")
+    run.add_argument("--output", "-o", default="bench-results.json")
+    run.add_argument("--filter", "-k", default="", help="Only run benchmarks containing this string")
+    run.add_argument("--scale", type=float, default=1.0, help="Multiplier for synthetic data sizes")
+    run.add_argument("--warmup", type=int, default=1)
+    run.add_argument("--repeats", type=int, default=5)
+    run.add_argument("--cpu", type=int, default=None, help="Pin the process to this CPU")
+
+    cmp = commands.add_parser("compare", help="Compare results against a baseline")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    cmp.add_argument("--threshold", type=float, default=0.15,
+                     help="Allowed slowdown of the median, as a fraction (0.15 = 15%%)")
+    cmp.add_argument("--allow-missing", action="store_true",
+                     help="Do not fail on baselined benchmarks that were skipped or not run")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        print("\n".join(BENCHMARKS))
+        return 0
+
+    if args.command == "run":
+        names = [name for name in BENCHMARKS if args.filter in name]
+        results = run_benchmarks(names, args.scale, args.warmup, args.repeats, args.cpu)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"Baseline {args.baseline} not found, nothing to compare against")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    failures = compare(baseline, current, args.threshold, args.allow_missing)
+    if failures:
+        print(f"{len(failures)} benchmark(s) regressed more than {args.threshold:.0%} "
+              f"or did not run: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+# datagen.py - Synthetic data generators for the benchmark suite
+import bz2
+import gzip
+import json
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List
+
+SEED = 1234
+
+LEVELS = ["DEBUG", "INFO", "INFO", "INFO", "WARNING", "ERROR"]
+MESSAGES = [
+    "GET /api/data 200 12ms",
+    "GET /health 200 1ms",
+    "POST /users 201 48ms",
+    "cache miss for key user:{n}",
+    "worker {n} picked up job build-{n}",
+    "connection reset by peer while talking to db-{n}",
+    "Traceback (most recent call last): timeout after {n}ms",
+]
+# One line in RARE_EVERY is an incident the index should find without a full scan
+RARE_MESSAGE = "OutOfMemoryError: Java heap space in build-{n}"
+RARE_EVERY = 50_000
+CITIES = ["New York", "San Francisco", "London", "Berlin", "Tokyo", "Sydney"]
+NAMES = ["Alice", "Bob", "Charlie", "Dana", "Eve", "Frank", "Grace", "Heidi"]
+
+
+def log_lines(count: int, seed: int = SEED, start: datetime = datetime(2025, 1, 1)):
+    """Yield log lines in the format DO/string-logger.py writes"""
+    rng = random.Random(seed)
+    ts = start
+    for _ in range(count):
+        ts += timedelta(milliseconds=rng.randint(1, 50))
+        level = rng.choice(LEVELS)
+        message = rng.choice(MESSAGES).format(n=rng.randint(0, 9999))
+        if rng.randrange(RARE_EVERY) == 0:
+            level, message = "ERROR", RARE_MESSAGE.format(n=rng.randint(0, 9999))
+        yield f"{ts:%Y-%m-%d %H:%M:%S},{ts.microsecond // 1000:03d} - {level} - {message}\n"
+
+
+def write_log(path: Path, count: int, seed: int = SEED) -> Path:
+    """Write a synthetic application log of `count` lines"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(log_lines(count, seed))
+    return path
+
+
+def write_gzip_log(path: Path, count: int, seed: int = SEED) -> Path:
+    """Write the same log as write_log(), gzip-compressed like a rotated archive"""
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.writelines(log_lines(count, seed))
+    return path
+
+
+def write_rotation_set(path: Path, members: int, count: int, seed: int = SEED) -> Path:
+    """
+    Write a live log plus `members - 1` rotated archives of `count` lines each,
+    alternating gzip and bzip2, one day apart (application.log.N is oldest)
+    """
+    start = datetime(2025, 1, 1)
+    for index in range(members):
+        day = start + timedelta(days=members - 1 - index)
+        if index == 0:
+            target, opener = path, open
+        elif index % 2:
+            target, opener = path.with_name(f"{path.name}.{index}.gz"), gzip.open
+        else:
+            target, opener = path.with_name(f"{path.name}.{index}.bz2"), bz2.open
+        with opener(target, "wt", encoding="utf-8") as f:
+            f.writelines(log_lines(count, seed + index, start=day))
+    return path
+
+
+def records(count: int, seed: int = SEED) -> List[Dict[str, Any]]:
+    """Build the record dicts DataProcessor works on"""
+    rng = random.Random(seed)
+    return [
+        {"name": rng.choice(NAMES), "age": rng.randint(18, 90), "city": rng.choice(CITIES)}
+        for _ in range(count)
+    ]
+
+
+def write_json(path: Path, count: int, seed: int = SEED) -> Path:
+    """Write a JSON document holding `count` records"""
+    with open(path, "w") as f:
+        json.dump({"records": records(count, seed)}, f)
+    return path
+
+
+def pipeline_configs(count: int, pipeline_module, seed: int = SEED) -> list:
+    """Build `count` PipelineConfigs using the classes of the generator module"""
+    rng = random.Random(seed)
+    Stage = pipeline_module.Stage
+    PipelineConfig = pipeline_module.PipelineConfig
+
+    configs = []
+    for n in range(count):
+        service = f"service-{n}"
+        stages = [
+            Stage(name="Checkout", steps=["checkout scm"]),
+            Stage(
+                name="Build",
+                steps=[
+                    '''script {
+                    def imageTag = "${env.DOCKER_IMAGE}:${params.PYTHON_VERSION}-${params.DOCKER_TAG}"
+                    sh "docker build --build-arg PYTHON_VERSION=${params.PYTHON_VERSION} -t ${imageTag} ."
+                    env.BUILT_IMAGE = imageTag
+                }'''
+                ]
+            ),
+            Stage(
+                name="Test",
+                steps=[f'sh "docker run --rm ${{env.BUILT_IMAGE}} python -m pytest tests/{service} -v"']
+            ),
+        ]
+        if rng.random() < 0.5:
+            stages.append(Stage(name="Deploy", steps=['sh "docker push ${env.BUILT_IMAGE}"'], when="branch 'main'"))
+
+        configs.append(PipelineConfig(
+            agent=rng.choice(["any", "{ label 'docker' }"]),
+            parameters=[
+                {
+                    'type': 'choice',
+                    'name': 'PYTHON_VERSION',
+                    'options': ['3.9', '3.10', '3.11', '3.12'],
+                    'description': 'Select Python version'
+                },
+                {
+                    'type': 'string',
+                    'name': 'DOCKER_TAG',
+                    'default': 'latest',
+                    'description': 'Docker image tag'
+                }
+            ],
+            environment={'DOCKER_IMAGE': service, 'REGISTRY': 'your-registry.com'},
+            stages=stages,
+            post_actions={
+                'always': ['sh "docker image prune -f"'],
+                'success': ['echo "Build successful!"'],
+                'failure': ['echo "Build failed!"']
+            }
+        ))
+    return configs
+
+
+def write_ini(path: Path) -> Path:
+    """Write the pipeline_config.ini that py-config/config_ini.py reads"""
+    path.write_text(
+        "[paths]\n"
+        "pipeline_dir = /opt/jenkins/pipelines\n"
+        "config_dir = /opt/jenkins/configs\n"
+        "templates_dir = /opt/jenkins/templates\n"
+        "logs_dir = /var/log/jenkins/pipelines\n"
+    )
+    return path
@@ -0,0 +1,104 @@
+# test_bench.py
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import bench
+
+
+def results(medians, skipped=None, scale=1.0):
+    """Minimal results document as written by `bench.py run`"""
+    return {
+        "meta": {"scale": scale},
+        "benchmarks": {name: {"median_s": median} for name, median in medians.items()},
+        "skipped": skipped or {},
+    }
+
+
+class TestCompare(unittest.TestCase):
+    """Test cases for the regression gate"""
+
+    def setUp(self):
+        self.out = io.StringIO()
+        self.baseline = results({"a": 1.0, "b": 2.0})
+
+    def test_within_threshold(self):
+        """Test that slowdowns up to the threshold pass"""
+        current = results({"a": 1.1, "b": 1.5})
+        self.assertEqual(bench.compare(self.baseline, current, 0.15, out=self.out), [])
+
+    def test_regression(self):
+        """Test that a median slower than the threshold fails"""
+        current = results({"a": 1.2, "b": 2.0})
+        self.assertEqual(bench.compare(self.baseline, current, 0.15, out=self.out), ["a"])
+        self.assertIn("REGRESSION", self.out.getvalue())
+
+    def test_skipped_benchmark_fails(self):
+        """Test that a baselined benchmark skipped in the current run fails"""
+        current = results({"a": 1.0}, skipped={"b": "app.py: No module named 'requests'"})
+        self.assertEqual(bench.compare(self.baseline, current, 0.15, out=self.out), ["b"])
+        self.assertIn("No module named 'requests'", self.out.getvalue())
+
+    def test_missing_benchmark_fails(self):
+        """Test that a baselined benchmark absent from the current run fails"""
+        current = results({"a": 1.0})
+        self.assertEqual(bench.compare(self.baseline, current, 0.15, out=self.out), ["b"])
+
+    def test_allow_missing(self):
+        """Test that missing and skipped benchmarks pass when explicitly allowed"""
+        current = results({"a": 1.0}, skipped={"b": "flask not installed"})
+        self.assertEqual(bench.compare(self.baseline, current, 0.15, allow_missing=True, out=self.out), [])
+
+    def test_new_benchmark(self):
+        """Test that a benchmark without a baseline is reported but does not fail"""
+        current = results({"a": 1.0, "b": 2.0, "c": 9.0})
+        self.assertEqual(bench.compare(self.baseline, current, 0.15, out=self.out), [])
+        self.assertIn("new, no baseline", self.out.getvalue())
+
+    def test_scale_mismatch_warns(self):
+        """Test that comparing runs at different scales warns"""
+        current = results({"a": 1.0, "b": 2.0}, scale=0.1)
+        bench.compare(self.baseline, current, 0.15, out=self.out)
+        self.assertIn("differs from current scale", self.out.getvalue())
+
+
+class TestCompareCommand(unittest.TestCase):
+    """Test cases for the exit status of `bench.py compare`"""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.baseline = os.path.join(self.dir.name, "baseline.json")
+        self.current = os.path.join(self.dir.name, "current.json")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def run_compare(self, baseline, current, *args):
+        for path, data in ((self.baseline, baseline), (self.current, current)):
+            if data is not None:
+                with open(path, "w") as f:
+                    json.dump(data, f)
+        with patch("sys.stdout", io.StringIO()):
+            return bench.main(["compare", self.baseline, self.current, *args])
+
+    def test_exit_status(self):
+        """Test exit status 1 on regressions and on skipped benchmarks"""
+        baseline = results({"a": 1.0, "b": 2.0})
+        self.assertEqual(self.run_compare(baseline, results({"a": 1.0, "b": 2.0})), 0)
+        self.assertEqual(self.run_compare(baseline, results({"a": 2.0, "b": 2.0})), 1)
+        self.assertEqual(self.run_compare(baseline, results({"a": 1.0}, skipped={"b": "x"})), 1)
+        self.assertEqual(self.run_compare(baseline, results({"a": 1.0}, skipped={"b": "x"}),
+                                          "--allow-missing"), 0)
+
+    def test_missing_baseline(self):
+        """Test that the first run, without a baseline, passes"""
+        self.assertEqual(self.run_compare(None, results({"a": 1.0})), 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)